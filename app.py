@@ -1,6 +1,8 @@
 import streamlit as st
 import uuid
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 import pandas as pd 
 import altair as alt 
@@ -10,13 +12,17 @@ from datetime import datetime
 from modules.mem0_config import mem0_client
 from modules.profiles import MAIN_CHARACTER_TRAITS, FORMALITY_LEVELS, COMMUNICATION_STYLES 
 from modules.pydantic_models import MoodAttributes, IntentAttributes 
-from modules.llm_setup import llm, mood_llm, intent_llm, get_system_prompt_template, generate_dynamic_profile, DynamicProfileOutput, get_user_personal_profile, suggest_conversation_topic # Import DynamicProfileOutput from llm_setup
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from modules.mood_scoring import MOOD_SCORE_MAP, parse_mood_from_memory, mood_score, mood_memory_time, mood_analysis_version
+from modules.llm_setup import llm, mood_llm, intent_llm, build_persona_prompt, generate_dynamic_profile, DynamicProfileOutput, get_user_personal_profile, suggest_conversation_topic # Import DynamicProfileOutput from llm_setup
+from langchain_core.messages import HumanMessage, AIMessage
 from pydantic import BaseModel
 
 
 load_dotenv()
 
+# Maximum number of personas answering a turn side by side in comparison mode
+MAX_COMPARISON_PERSONAS = 3
+
 if not all([os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_API_ENDPOINT"),
             os.getenv("OPENAI_MODEL_DEPLOYMENT_NAME"), os.getenv("MEM0_API_KEY")]):
     st.error("Please ensure all required environment variables are set in your .env file.")
@@ -84,21 +90,6 @@ st.markdown(
 
 st.title("Girls Chatbot Demo")
 
-# --- Mood Mapping for Visualization ---
-# Define a mapping from mood strings to numerical values for plotting
-MOOD_SCORE_MAP = {
-    "joyful": 5,
-    "excited": 4,
-    "neutral": 3,
-    "confused": 2.5,
-    "surprised": 3.5,
-    "fearful": 1.5,
-    "anxious": 1.7,
-    "sad": 1,
-    "angry": 0.5,
-    "disgusted": 0
-}
-
 # --- Streamlit Session State Initialization ---
 if "mem0_session_id" not in st.session_state:
     st.session_state.mem0_session_id = str(uuid.uuid4())
@@ -111,6 +102,9 @@ if "mem0_session_id" not in st.session_state:
         "description": "A versatile chatbot waiting for your personality settings.",
         "behavioral_traits": "The chatbot will be neutral until specific traits are selected."
     }
+    st.session_state.persona_prompt = build_persona_prompt(st.session_state.dynamic_profile)
+    st.session_state.chat_history = [] # LangChain message objects mirroring st.session_state.messages
+    st.session_state.comparison_personas = [] # Personas answering side by side in comparison mode
 
     st.session_state.current_mood = None
     st.session_state.current_intent = None
@@ -161,10 +155,14 @@ if st.sidebar.button("Generate Persona"):
         with st.spinner("Generating new persona..."):
             new_profile = generate_dynamic_profile(selected_traits, selected_formality, selected_style)
             st.session_state.dynamic_profile = new_profile
+            st.session_state.persona_prompt = build_persona_prompt(new_profile) # Compiled once per persona
             st.session_state.selected_traits = selected_traits
             st.session_state.selected_formality = selected_formality
             st.session_state.selected_style = selected_style
             st.session_state.messages = [] # Clear local chat history for new persona
+            st.session_state.chat_history = []
+            for persona in st.session_state.comparison_personas:
+                persona["chat_history"] = [] # Keep compared personas in step with the reset conversation
             st.session_state.mem0_session_id = str(uuid.uuid4()) # Start new mem0 session
             st.session_state.user_profile_summary = None # Reset user profile summary on new persona
             st.session_state.mood_history_data = None # Reset mood history on new persona
@@ -187,6 +185,35 @@ st.sidebar.markdown(f"**Formality:** {st.session_state.selected_formality}")
 st.sidebar.markdown(f"**Style:** {st.session_state.selected_style}")
 
 
+# --- Persona Comparison Section ---
+st.sidebar.markdown("---")
+st.sidebar.subheader("Persona Comparison")
+
+comparison_mode = st.sidebar.checkbox("Compare personas side by side", key="comparison_mode")
+
+if st.sidebar.button("Add Current Persona to Comparison"):
+    if any(persona["profile"] == st.session_state.dynamic_profile for persona in st.session_state.comparison_personas):
+        st.sidebar.warning("This persona is already in the comparison. Generate a different persona first.")
+    elif len(st.session_state.comparison_personas) >= MAX_COMPARISON_PERSONAS:
+        st.sidebar.warning(f"You can compare up to {MAX_COMPARISON_PERSONAS} personas. Clear the comparison to start over.")
+    else:
+        st.session_state.comparison_personas.append({
+            "profile": dict(st.session_state.dynamic_profile),
+            "prompt": st.session_state.persona_prompt, # Reuse the prompt compiled on "Generate Persona"
+            "chat_history": list(st.session_state.chat_history) # Start from the conversation shown on screen
+        })
+        st.sidebar.success("Persona added to comparison!")
+
+if st.sidebar.button("Clear Comparison"):
+    st.session_state.comparison_personas = []
+
+if st.session_state.comparison_personas:
+    for i, persona in enumerate(st.session_state.comparison_personas):
+        st.sidebar.markdown(f"**Persona {i+1}:** {persona['profile']['description']}")
+else:
+    st.sidebar.info("Generate a persona and click 'Add Current Persona to Comparison' to compare how different personas reply.")
+
+
 # --- User Personal Profile Section ---
 st.sidebar.markdown("---")
 st.sidebar.subheader("User Personal Profile")
@@ -263,35 +290,17 @@ if st.sidebar.button("Show Mood History"):
                 # We need to parse it to extract the mood and optionally intensity.
                 # Example: "Mood: joyful, Intensity: medium, Reason: good news"
                 mood_text = memory.get('memory', '')
-                detected_mood = "neutral" # Default if not parsed
-                
-                # Simple parsing logic for the mood string
-                # This could be more robust with regex if the format varies
-                if "mood:" in mood_text.lower():
-                    # Attempt to extract mood from a structured part
-                    parts = mood_text.split("Mood:")
-                    if len(parts) > 1:
-                        mood_part = parts[1].split(',')[0].strip().lower()
-                        # Clean up and map
-                        for mood_key in MOOD_SCORE_MAP.keys():
-                            if mood_key in mood_part:
-                                detected_mood = mood_key
-                                break
-                else:
-                    # Fallback for simpler mood mentions
-                    for mood_key in MOOD_SCORE_MAP.keys():
-                        if mood_key in mood_text.lower():
-                            detected_mood = mood_key
-                            break
-
-                # Get timestamp and convert to datetime object
-                created_at_iso = memory.get('created_at')
+                detected_mood = parse_mood_from_memory(mood_text)
+
+                # Get timestamp and convert to datetime object; re-analyzed moods are placed at their message's time
+                created_at_iso = mood_memory_time(memory)
                 timestamp = datetime.fromisoformat(created_at_iso.replace('Z', '+00:00')) if created_at_iso else datetime.now()
                 
                 mood_data_for_chart.append({
                     "time": timestamp,
                     "mood": detected_mood,
-                    "mood_score": MOOD_SCORE_MAP.get(detected_mood, 3) # Default to neutral if not found
+                    "mood_score": mood_score(detected_mood), # Default to neutral if not found
+                    "analysis": mood_analysis_version(memory) or "chat" # Tells re-analyzed moods from the original ones
                 })
             
             if mood_data_for_chart:
@@ -316,7 +325,8 @@ if st.session_state.mood_history_data is not None and not st.session_state.mood_
         x=alt.X('time', axis=alt.Axis(title='Time', format='%H:%M')),
         y=alt.Y('mood_score', axis=alt.Axis(title='Mood Score', values=list(MOOD_SCORE_MAP.values()),
                                             labelExpr="datum.value == 0.5 ? 'Angry' : datum.value == 1 ? 'Sad' : datum.value == 1.5 ? 'Fearful' : datum.value == 1.7 ? 'Anxious' : datum.value == 2.5 ? 'Confused' : datum.value == 3 ? 'Neutral' : datum.value == 3.5 ? 'Surprised' : datum.value == 4 ? 'Excited' : datum.value == 5 ? 'Joyful' : ''")),
-        tooltip=['time', 'mood', 'mood_score']
+        color=alt.Color('analysis', title='Analysis'), # One line per analysis, so superseded moods stay apart
+        tooltip=['time', 'mood', 'mood_score', 'analysis']
     ).properties(
         title='User Mood Trend'
     ).interactive() # Make the chart interactive (zoom, pan)
@@ -327,10 +337,60 @@ else:
         st.sidebar.info("Chat with the bot, and your mood will be analyzed on each turn. Then click 'Show Mood History' to see the trend. Ensure your API key has necessary permissions for Mem0.")
 
 
+# --- Comparison Mode Helpers ---
+async def stream_persona_reply(messages, reply_placeholder, error_placeholder, timing_placeholder):
+    """
+    Streams one persona's reply into its column and returns the reply with its timing.
+    If generation fails, "error" holds the reason and "content" whatever was streamed before it.
+    """
+    started = time.perf_counter()
+    first_token = None
+    reply = ""
+    error = None
+    try:
+        async for chunk in llm.astream(messages):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            reply += chunk.content
+            reply_placeholder.markdown(reply + "▌")
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+    reply_placeholder.markdown(reply)
+    if error:
+        error_placeholder.error(f"Could not generate a reply: {error}")
+    timing = f"First token: {first_token:.2f}s · " if first_token is not None else ""
+    timing_placeholder.caption(f"{timing}Total: {elapsed:.2f}s")
+    return {"content": reply, "error": error, "first_token": first_token, "elapsed": elapsed}
+
+async def fan_out_persona_replies(personas, persona_messages, columns):
+    """
+    Generates all persona replies concurrently, so the turn takes as long as the slowest reply.
+    """
+    tasks = []
+    for i, (persona, messages, column) in enumerate(zip(personas, persona_messages, columns)):
+        column.markdown(f"**Persona {i+1}**", help=persona["profile"]["description"])
+        tasks.append(stream_persona_reply(messages, column.empty(), column.empty(), column.empty()))
+    return await asyncio.gather(*tasks)
+
+def render_comparison_replies(replies):
+    columns = st.columns(len(replies))
+    for i, (reply, column) in enumerate(zip(replies, columns)):
+        column.markdown(f"**Persona {i+1}**", help=reply["persona"])
+        column.markdown(reply["content"])
+        if reply.get("error"):
+            column.error(f"Could not generate a reply: {reply['error']}")
+        timing = f"First token: {reply['first_token']:.2f}s · " if reply["first_token"] is not None else ""
+        column.caption(f"{timing}Total: {reply['elapsed']:.2f}s")
+
+
 # --- Display Chat History (from Streamlit session state) ---
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+        if "comparison" in message:
+            render_comparison_replies(message["comparison"])
+        else:
+            st.markdown(message["content"])
 
 # --- Chat Input and Logic ---
 prompt = st.chat_input("Type your message here...")
@@ -338,6 +398,11 @@ prompt = st.chat_input("Type your message here...")
 if prompt: # Only proceed if there's a prompt
     # Add user message to Streamlit history (local chat history)
     st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.chat_history.append(HumanMessage(content=prompt))
+    # Compared personas get every turn, so switching comparison mode off and on keeps their history complete
+    for persona in st.session_state.comparison_personas:
+        persona["chat_history"].append(HumanMessage(content=prompt))
+    comparing = comparison_mode and bool(st.session_state.comparison_personas)
     # Display user message immediately (this is important for interactive feel)
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -423,34 +488,47 @@ if prompt: # Only proceed if there's a prompt
 
 
     # --- Adaptive Response Generation ---
-    with st.chat_message("assistant"):
-        with st.spinner(f"Thinking as a dynamically generated persona..."):
-            # Use dynamic_profile from session state
-            profile_desc = st.session_state.dynamic_profile['description']
-            profile_traits = st.session_state.dynamic_profile['behavioral_traits']
-
-            system_prompt_template = get_system_prompt_template()
-
-            system_message_content = system_prompt_template.format(
-                persona_name="Dynamically Generated Persona", # Generic name as it's dynamic
-                profile_description=profile_desc,
-                profile_behavioral_traits=profile_traits,
+    if comparing:
+        # Memory search and mood/intent analysis above are shared; only generation fans out per persona
+        personas = st.session_state.comparison_personas
+        persona_messages = [
+            persona["prompt"].format_messages(
                 relevant_memories=relevant_memories_str,
                 user_mood=user_mood_str,
-                user_intent=user_intent_str
+                user_intent=user_intent_str,
+                history=persona["chat_history"]
             )
+            for persona in personas
+        ]
+        with st.chat_message("assistant"):
+            replies = asyncio.run(fan_out_persona_replies(personas, persona_messages, st.columns(len(personas))))
+
+        for persona, reply in zip(personas, replies):
+            reply["persona"] = persona["profile"]["description"]
+            # Failed replies are only shown, never fed back to the model as conversation
+            if not reply["error"]:
+                persona["chat_history"].append(AIMessage(content=reply["content"]))
+        # The main persona keeps the first successful reply, matching what st.session_state.messages stores
+        main_reply = next((reply["content"] for reply in replies if not reply["error"]), None)
+        st.session_state.messages.append({"role": "assistant", "content": main_reply or "", "comparison": replies})
+        if main_reply is not None:
+            st.session_state.chat_history.append(AIMessage(content=main_reply))
 
-            messages = [
-                SystemMessage(content=system_message_content)
-            ]
-
-            for msg in st.session_state.messages:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-
-            ai_response = llm.invoke(messages)
-            st.markdown(ai_response.content)
-
-            st.session_state.messages.append({"role": "assistant", "content": ai_response.content})
+    else:
+        with st.chat_message("assistant"):
+            with st.spinner(f"Thinking as a dynamically generated persona..."):
+                # Persona fields are already bound in the session's prompt; only per-turn context is filled in here
+                messages = st.session_state.persona_prompt.format_messages(
+                    relevant_memories=relevant_memories_str,
+                    user_mood=user_mood_str,
+                    user_intent=user_intent_str,
+                    history=st.session_state.chat_history
+                )
+
+                ai_response = llm.invoke(messages)
+                st.markdown(ai_response.content)
+
+                st.session_state.messages.append({"role": "assistant", "content": ai_response.content})
+                st.session_state.chat_history.append(AIMessage(content=ai_response.content))
+                for persona in st.session_state.comparison_personas:
+                    persona["chat_history"].append(AIMessage(content=ai_response.content))
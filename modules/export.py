@@ -0,0 +1,258 @@
+# modules/export.py
+#
+# Streams memories and parsed mood data for a set of users from Mem0 into a columnar file for analytics.
+# Run it from the project root:
+#
+#   python -m modules.export --user-ids <id> [<id> ...] --output memories.parquet
+#   python -m modules.export --user-ids <id> --output memories_delta.parquet --watermark export_watermark.json
+#
+# The watermark file keeps one timestamp per user_id: the snapshot time of the last successful export
+# that included the user. Users not in the file yet are exported in full.
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from modules.mem0_config import iter_user_memory_pages
+from modules.mood_scoring import parse_mood_from_memory, mood_score, mood_memory_time, mood_analysis_version
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_ROW_GROUP_SIZE = 10_000
+DEFAULT_MAX_CONCURRENCY = 4
+
+EXPORT_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("memory_id", pa.string()),
+    ("category", pa.string()),
+    ("memory", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("mood", pa.string()),
+    ("mood_score", pa.float64()),
+    # Time of the message the mood describes; differs from created_at for re-analyzed moods
+    ("mood_at", pa.timestamp("us", tz="UTC")),
+    # Set for moods written by modules.reanalysis, null for moods stored by the chat loop
+    ("analysis_version", pa.string()),
+])
+
+# Marks the end of one user's stream on the row queue: (_USER_DONE, user_id, error or None)
+_USER_DONE = object()
+
+# How long a worker waits on a full queue before checking whether the export was cancelled
+_PUT_TIMEOUT_SECONDS = 0.5
+
+
+def _parse_timestamp(created_at_iso: Optional[str]) -> Optional[datetime]:
+    # Timestamps without an offset (e.g. --since 2024-01-01) are taken as UTC, like Mem0's created_at
+    if not created_at_iso:
+        return None
+    timestamp = datetime.fromisoformat(created_at_iso.replace('Z', '+00:00'))
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def in_export_window(memory: dict, since: Optional[datetime], until: datetime) -> bool:
+    """
+    True if the memory was created after the watermark `since` and up to the export snapshot `until`.
+    The previous export included memories at exactly its snapshot time, so those are skipped.
+    """
+    if not memory.get("created_at"):
+        return since is None
+    created_at = _parse_timestamp(memory["created_at"])
+    return (since is None or created_at > since) and created_at <= until
+
+
+def memory_to_row(user_id: str, memory: dict) -> dict:
+    """
+    Flattens a Mem0 memory into an export row. Mood columns are only filled for 'user_mood' memories.
+    """
+    categories = memory.get("categories") or []
+    memory_text = memory.get("memory", "")
+    is_mood = "user_mood" in categories
+    mood = parse_mood_from_memory(memory_text) if is_mood else None
+    return {
+        "user_id": user_id,
+        "memory_id": memory.get("id"),
+        "category": ",".join(categories) if categories else None,
+        "memory": memory_text,
+        "created_at": _parse_timestamp(memory.get("created_at")),
+        "mood": mood,
+        "mood_score": mood_score(mood) if mood else None,
+        "mood_at": _parse_timestamp(mood_memory_time(memory)) if is_mood else None,
+        "analysis_version": mood_analysis_version(memory) if is_mood else None,
+    }
+
+
+class _ColumnarWriter:
+    """
+    Thin wrapper over the Parquet and Arrow IPC file writers so both write one batch per row group.
+    """
+
+    def __init__(self, output_path: str, file_format: str):
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(output_path, EXPORT_SCHEMA)
+        else:
+            self._writer = pa.ipc.new_file(output_path, EXPORT_SCHEMA)
+        self._file_format = file_format
+
+    def write_rows(self, rows: List[dict]) -> None:
+        table = pa.Table.from_pylist(rows, schema=EXPORT_SCHEMA)
+        if self._file_format == "parquet":
+            self._writer.write_table(table, row_group_size=len(rows))
+        else:
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def load_watermarks(path: Optional[str]) -> dict:
+    """
+    Returns the per-user watermarks ({user_id: ISO timestamp}) of previous exports.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("users", {})
+
+
+def save_watermarks(path: str, watermarks: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"users": watermarks}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _put(rows_queue: queue.Queue, item, cancel: threading.Event) -> bool:
+    # Blocks while the queue is full, but gives up once the export is cancelled so workers never hang
+    while not cancel.is_set():
+        try:
+            rows_queue.put(item, timeout=_PUT_TIMEOUT_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce_user_rows(user_id: str, rows_queue: queue.Queue, cancel: threading.Event,
+                       page_size: int, since: Optional[datetime], until: datetime) -> None:
+    # Runs on a worker thread; the bounded queue applies backpressure when the writer falls behind
+    error = None
+    try:
+        pages = iter_user_memory_pages(user_id, page_size=page_size,
+                                       since=since.isoformat() if since else None, until=until.isoformat())
+        for _, memories in pages:
+            rows = [memory_to_row(user_id, memory) for memory in memories if in_export_window(memory, since, until)]
+            if rows and not _put(rows_queue, rows, cancel):
+                return
+    except Exception as e:
+        print(f"Error exporting memories for user {user_id}: {e}")
+        error = e
+    finally:
+        _put(rows_queue, (_USER_DONE, user_id, error), cancel)
+
+
+def export_memories(user_ids: List[str], output_path: str, file_format: str = "parquet",
+                    row_group_size: int = DEFAULT_ROW_GROUP_SIZE, page_size: int = DEFAULT_PAGE_SIZE,
+                    max_concurrency: int = DEFAULT_MAX_CONCURRENCY, since: Optional[dict] = None) -> dict:
+    """
+    Exports the memories of the given users to a Parquet or Arrow file. `since` maps user_ids to the
+    watermark after which their memories are exported; users without one are exported in full.
+    Users are paged concurrently, and rows are written in fixed-size row groups so at most a few pages
+    per worker plus one row group are held in memory.
+
+    Every user is read up to the same snapshot time taken when the export starts, so memories added
+    while the export runs are left for the next one. Returns the number of exported rows, the snapshot
+    time (the next watermark of every exported user) and the users whose export failed, mapped to their error.
+    """
+    since = since or {}
+    snapshot = _now()
+    rows_queue = queue.Queue(maxsize=max_concurrency * 2)
+    cancel = threading.Event()
+    writer = _ColumnarWriter(output_path, file_format)
+    buffer = []
+    exported = 0
+    failed_users = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            try:
+                for user_id in user_ids:
+                    executor.submit(_produce_user_rows, user_id, rows_queue, cancel, page_size,
+                                    _parse_timestamp(since.get(user_id)), snapshot)
+
+                remaining_users = len(user_ids)
+                while remaining_users:
+                    item = rows_queue.get()
+                    if isinstance(item, tuple) and item[0] is _USER_DONE:
+                        _, user_id, error = item
+                        if error is not None:
+                            failed_users[user_id] = str(error)
+                        remaining_users -= 1
+                        continue
+                    buffer.extend(item)
+                    while len(buffer) >= row_group_size:
+                        writer.write_rows(buffer[:row_group_size])
+                        exported += row_group_size
+                        buffer = buffer[row_group_size:]
+            except BaseException:
+                # Writer error or Ctrl-C: stop the workers so the executor shutdown does not wait on a full queue
+                cancel.set()
+                executor.shutdown(cancel_futures=True)
+                raise
+        if buffer:
+            writer.write_rows(buffer)
+            exported += len(buffer)
+    finally:
+        writer.close()
+
+    return {
+        "rows": exported,
+        "snapshot": snapshot.isoformat(),
+        "failed_users": failed_users
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Mem0 memories and mood data to a columnar file.")
+    parser.add_argument("--user-ids", nargs="+", required=True, help="Mem0 user_ids to export.")
+    parser.add_argument("--output", required=True, help="Output file path.")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--since", help="Only export memories created after this ISO timestamp (overrides the watermark).")
+    parser.add_argument("--watermark", help="Per-user watermark file: read to export only new memories, updated after a successful export.")
+    args = parser.parse_args()
+
+    watermarks = load_watermarks(args.watermark)
+    since = {user_id: args.since or watermarks.get(user_id) for user_id in args.user_ids}
+    result = export_memories(args.user_ids, args.output, file_format=args.format,
+                             row_group_size=args.row_group_size, page_size=args.page_size,
+                             max_concurrency=args.max_concurrency, since=since)
+    print(f"Exported {result['rows']} rows to {args.output} (snapshot {result['snapshot']})")
+
+    if result["failed_users"]:
+        # Advancing the watermark now would skip the failed users' memories on every later export
+        print(f"Export failed for {len(result['failed_users'])} user(s): {', '.join(result['failed_users'])}. "
+              "Watermark not updated.")
+        sys.exit(1)
+
+    if args.watermark:
+        # Other users' watermarks are kept, so exports of different user sets can share one file
+        watermarks.update({user_id: result["snapshot"] for user_id in args.user_ids})
+        save_watermarks(args.watermark, watermarks)
+
+
+if __name__ == "__main__":
+    main()
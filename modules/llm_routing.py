@@ -0,0 +1,151 @@
+# modules/llm_routing.py
+#
+# Per-task model routing: each task (reply, persona, mood, ...) gets its own deployment, temperature and
+# max tokens, so cheap classification and summarization calls can target a smaller deployment.
+# Calls on a non-main deployment automatically fall back to the main deployment on error, and every call
+# logs its route, deployment, latency, token usage and estimated cost.
+#
+# Configuration (.env), all optional:
+#   OPENAI_SMALL_MODEL_DEPLOYMENT_NAME       deployment used by the "small" routes (falls back to the main one)
+#   OPENAI_MODEL_INPUT_COST_PER_1K / OPENAI_MODEL_OUTPUT_COST_PER_1K              main deployment prices
+#   OPENAI_SMALL_MODEL_INPUT_COST_PER_1K / OPENAI_SMALL_MODEL_OUTPUT_COST_PER_1K  small deployment prices
+#   LLM_ROUTE_<TASK>_DEPLOYMENT, _TEMPERATURE, _MAX_TOKENS, _INPUT_COST_PER_1K, _OUTPUT_COST_PER_1K
+#                                            per-task overrides, e.g. LLM_ROUTE_MOOD_DEPLOYMENT
+
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import AzureChatOpenAI
+from pydantic import BaseModel
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_ENDPOINT = os.getenv("OPENAI_API_ENDPOINT")
+OPENAI_MODEL_DEPLOYMENT_NAME = os.getenv("OPENAI_MODEL_DEPLOYMENT_NAME")
+OPENAI_SMALL_MODEL_DEPLOYMENT_NAME = os.getenv("OPENAI_SMALL_MODEL_DEPLOYMENT_NAME") or OPENAI_MODEL_DEPLOYMENT_NAME
+LLM_AZURE_API_VERSION = os.getenv("OPENAI_API_VERSION")
+
+# Default routing table: tier ("main" or "small"), temperature and max tokens per task
+ROUTE_DEFAULTS = {
+    "reply": {"tier": "main", "temperature": 0.7, "max_tokens": None},
+    "persona": {"tier": "main", "temperature": 0.7, "max_tokens": None},
+    "mood": {"tier": "small", "temperature": 0.0, "max_tokens": 200},
+    "intent": {"tier": "small", "temperature": 0.0, "max_tokens": 200},
+    "user_profile": {"tier": "small", "temperature": 0.3, "max_tokens": 500},
+    "topic": {"tier": "small", "temperature": 0.7, "max_tokens": 200},
+}
+
+class RouteConfig(BaseModel):
+    task: str
+    deployment: str
+    temperature: float
+    max_tokens: Optional[int] = None
+    input_cost_per_1k: float = 0.0
+    output_cost_per_1k: float = 0.0
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+def _tier_settings(tier: str) -> dict:
+    prefix = "OPENAI_SMALL_MODEL" if tier == "small" else "OPENAI_MODEL"
+    return {
+        "deployment": OPENAI_SMALL_MODEL_DEPLOYMENT_NAME if tier == "small" else OPENAI_MODEL_DEPLOYMENT_NAME,
+        "input_cost_per_1k": _env_float(f"{prefix}_INPUT_COST_PER_1K", 0.0),
+        "output_cost_per_1k": _env_float(f"{prefix}_OUTPUT_COST_PER_1K", 0.0),
+    }
+
+def load_route_config(task: str) -> RouteConfig:
+    """
+    Builds the route for a task from ROUTE_DEFAULTS, overridden by LLM_ROUTE_<TASK>_* environment variables.
+    """
+    defaults = ROUTE_DEFAULTS[task]
+    tier = _tier_settings(defaults["tier"])
+    prefix = f"LLM_ROUTE_{task.upper()}"
+    max_tokens = _env_float(f"{prefix}_MAX_TOKENS", defaults["max_tokens"])
+    return RouteConfig(
+        task=task,
+        deployment=os.getenv(f"{prefix}_DEPLOYMENT") or tier["deployment"],
+        temperature=_env_float(f"{prefix}_TEMPERATURE", defaults["temperature"]),
+        max_tokens=int(max_tokens) if max_tokens is not None else None,
+        input_cost_per_1k=_env_float(f"{prefix}_INPUT_COST_PER_1K", tier["input_cost_per_1k"]),
+        output_cost_per_1k=_env_float(f"{prefix}_OUTPUT_COST_PER_1K", tier["output_cost_per_1k"]),
+    )
+
+class RouteMetricsHandler(BaseCallbackHandler):
+    """
+    Logs latency, token usage and estimated cost of every call made through a route.
+    """
+
+    def __init__(self, route: RouteConfig, fallback: bool = False):
+        self.route = route
+        self.fallback = fallback
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        latency_ms = (time.perf_counter() - self._started.pop(run_id, time.perf_counter())) * 1000
+        usage = {}
+        generations = response.generations[0] if response.generations else []
+        if generations and getattr(generations[0], "message", None) is not None:
+            usage = generations[0].message.usage_metadata or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cost = (input_tokens * self.route.input_cost_per_1k + output_tokens * self.route.output_cost_per_1k) / 1000
+        self._log(f"latency_ms={latency_ms:.0f} input_tokens={input_tokens} output_tokens={output_tokens} cost_usd={cost:.6f}")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        latency_ms = (time.perf_counter() - self._started.pop(run_id, time.perf_counter())) * 1000
+        self._log(f"latency_ms={latency_ms:.0f} error={type(error).__name__}: {error}")
+
+    def _log(self, details: str):
+        print(f"[llm-route] route={self.route.task} deployment={self.route.deployment} fallback={self.fallback} {details}")
+
+# Retries on a route's primary deployment when a fallback is attached; the fallback should start quickly
+PRIMARY_RETRIES_WITH_FALLBACK = 0
+
+def _build_chat_model(route: RouteConfig, fallback: bool = False, max_retries: int = 2) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        azure_deployment=route.deployment,
+        api_key=OPENAI_API_KEY,
+        azure_endpoint=OPENAI_API_ENDPOINT,
+        api_version=LLM_AZURE_API_VERSION,
+        temperature=route.temperature,
+        max_tokens=route.max_tokens,
+        max_retries=max_retries,
+        stream_usage=True, # Report token usage for streamed replies too
+        callbacks=[RouteMetricsHandler(route, fallback=fallback)]
+    )
+
+def get_routed_llm(task: str, schema: Optional[type] = None, **structured_output_kwargs):
+    """
+    Returns the model for a task, optionally wrapped with structured output for `schema`.
+    Routes on a deployment other than the main one fall back to the main deployment on error.
+    """
+    route = load_route_config(task)
+    has_fallback = route.deployment != OPENAI_MODEL_DEPLOYMENT_NAME
+    if has_fallback:
+        primary = _build_chat_model(route, max_retries=PRIMARY_RETRIES_WITH_FALLBACK)
+    else:
+        primary = _build_chat_model(route)
+    if schema is not None:
+        primary = primary.with_structured_output(schema, **structured_output_kwargs)
+    if not has_fallback:
+        return primary
+
+    main_settings = _tier_settings("main")
+    fallback_route = route.model_copy(update={
+        "deployment": main_settings["deployment"],
+        "input_cost_per_1k": main_settings["input_cost_per_1k"],
+        "output_cost_per_1k": main_settings["output_cost_per_1k"],
+    })
+    fallback = _build_chat_model(fallback_route, fallback=True)
+    if schema is not None:
+        fallback = fallback.with_structured_output(schema, **structured_output_kwargs)
+    return primary.with_fallbacks([fallback])
@@ -1,9 +1,10 @@
 
 import os
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from modules.pydantic_models import MoodAttributes, IntentAttributes, UserProfile
+from modules.llm_routing import get_routed_llm
 from pydantic import BaseModel, Field 
 from typing import List
 
@@ -19,17 +20,15 @@ if not all([OPENAI_API_KEY, OPENAI_API_ENDPOINT, OPENAI_MODEL_DEPLOYMENT_NAME, O
     raise ValueError("One or more Azure OpenAI environment variables are not set.")
 
 
-llm = AzureChatOpenAI(
-    azure_deployment=OPENAI_MODEL_DEPLOYMENT_NAME,
-    api_key=OPENAI_API_KEY,
-    azure_endpoint=OPENAI_API_ENDPOINT,
-    api_version=LLM_AZURE_API_VERSION,
-    temperature=0.7 
-)
+# Main LLM for persona replies. Each task has its own route (deployment, temperature, max tokens), see modules/llm_routing.py
+llm = get_routed_llm("reply")
 
 # LLMs for structured output (mood and intent detection)
-mood_llm = llm.with_structured_output(MoodAttributes, method="function_calling", include_raw=True)
-intent_llm = llm.with_structured_output(IntentAttributes, method="function_calling", include_raw=True)
+mood_llm = get_routed_llm("mood", MoodAttributes, method="function_calling", include_raw=True)
+intent_llm = get_routed_llm("intent", IntentAttributes, method="function_calling", include_raw=True)
+
+# LLM for conversation topic suggestions
+topic_llm = get_routed_llm("topic")
 
 # Pydantic model for dynamic profile generation (MOVED HERE from pydantic_models.py)
 class DynamicProfileOutput(BaseModel):
@@ -37,10 +36,10 @@ class DynamicProfileOutput(BaseModel):
     behavioral_traits: str = Field(description="A detailed explanation of how the chatbot will behave, its tone, and interaction style, derived from the selected characteristics.")
 
 # LLM for dynamic profile generation
-profile_generator_llm = llm.with_structured_output(DynamicProfileOutput, method="function_calling", include_raw=False)
+profile_generator_llm = get_routed_llm("persona", DynamicProfileOutput, method="function_calling", include_raw=False)
 
 # LLM for generating user profile summary from Mem0 data
-user_profile_llm = llm.with_structured_output(UserProfile, method="function_calling", include_raw=False)
+user_profile_llm = get_routed_llm("user_profile", UserProfile, method="function_calling", include_raw=False)
 
 def generate_dynamic_profile(traits: list[str], formality: str, style: str) -> dict:
     """
@@ -120,7 +119,7 @@ def suggest_conversation_topic(topic_memories: List[dict]) -> str:
     Example: "Since you mentioned your love for space exploration, how about we dive into the latest Mars rover discoveries?"
     """
     try:
-        suggestion_response = llm.invoke(prompt) 
+        suggestion_response = topic_llm.invoke(prompt)
         return suggestion_response.content
     except Exception as e:
         print(f"Error suggesting topic: {e}")
@@ -152,3 +151,17 @@ def get_system_prompt_template():
     - Do not explicitly mention 'mood', 'intent' detection, or 'memories' to the user in your natural conversation.
     """
 
+def build_persona_prompt(dynamic_profile: dict) -> ChatPromptTemplate:
+    """
+    Builds the chat prompt for a persona once, when the persona is generated.
+    The persona fields are bound as partials; only the per-turn context (mood, intent, memories)
+    and the already-converted message history are supplied on each turn.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", get_system_prompt_template()),
+        MessagesPlaceholder(variable_name="history")
+    ])
+    return prompt.partial(
+        profile_description=dynamic_profile['description'],
+        profile_behavioral_traits=dynamic_profile['behavioral_traits']
+    )
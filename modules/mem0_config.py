@@ -82,3 +82,33 @@ except Exception as e:
 
 
 
+
+
+def iter_user_memory_pages(user_id: str, page_size: int = 100, start_page: int = 1, since: str = None, until: str = None):
+    """
+    Yields (page_number, memories) for all memories stored for a user, one Mem0 page at a time,
+    so callers can stream a user's full history without loading it into memory.
+    If `since`/`until` (ISO timestamps) are given, only memories created in that range are returned.
+    Passing a fixed `until` keeps page numbers stable while new memories are being added for the user.
+    """
+    filters = [{"user_id": user_id}]
+    if since:
+        filters.append({"created_at": {"gte": since}})
+    if until:
+        filters.append({"created_at": {"lte": until}})
+    page = start_page
+    while True:
+        response = mem0_client.get_all(
+            version="v2",
+            filters={"AND": filters},
+            page=page,
+            page_size=page_size
+        )
+        # Paginated v2 responses are {"count", "next", "previous", "results"}; be lenient with plain lists
+        memories = response.get("results", []) if isinstance(response, dict) else response
+        if not memories:
+            return
+        yield page, memories
+        if not isinstance(response, dict) or not response.get("next"):
+            return
+        page += 1
@@ -0,0 +1,57 @@
+# modules/mood_scoring.py
+
+# --- Mood Mapping for Visualization ---
+# Define a mapping from mood strings to numerical values for plotting
+MOOD_SCORE_MAP = {
+    "joyful": 5,
+    "excited": 4,
+    "neutral": 3,
+    "confused": 2.5,
+    "surprised": 3.5,
+    "fearful": 1.5,
+    "anxious": 1.7,
+    "sad": 1,
+    "angry": 0.5,
+    "disgusted": 0
+}
+
+def parse_mood_from_memory(mood_text: str) -> str:
+    """
+    Extracts the mood keyword from a 'user_mood' memory such as "Mood: joyful, Intensity: medium, Reason: good news".
+    Falls back to any known mood mentioned in the text, and to "neutral" if none is found.
+    """
+    if "mood:" in mood_text.lower():
+        # Attempt to extract mood from a structured part
+        parts = mood_text.split("Mood:")
+        if len(parts) > 1:
+            mood_part = parts[1].split(',')[0].strip().lower()
+            for mood_key in MOOD_SCORE_MAP.keys():
+                if mood_key in mood_part:
+                    return mood_key
+    else:
+        # Fallback for simpler mood mentions
+        for mood_key in MOOD_SCORE_MAP.keys():
+            if mood_key in mood_text.lower():
+                return mood_key
+    return "neutral"
+
+def mood_memory_time(memory: dict):
+    """
+    Returns the ISO time a 'user_mood' memory describes: the analyzed message's time for moods written
+    by the re-analysis job, otherwise the memory's own created_at.
+    """
+    metadata = memory.get("metadata") or {}
+    return metadata.get("source_created_at") or memory.get("created_at")
+
+def mood_analysis_version(memory: dict):
+    """
+    Returns the analysis version of a re-analyzed mood, or None for moods stored by the chat loop.
+    """
+    metadata = memory.get("metadata") or {}
+    return metadata.get("analysis_version") if metadata.get("source") == "reanalysis" else None
+
+def mood_score(mood: str) -> float:
+    """
+    Returns the numerical score of a mood, defaulting to neutral if the mood is unknown.
+    """
+    return MOOD_SCORE_MAP.get(mood, 3)
@@ -0,0 +1,283 @@
+# modules/reanalysis.py
+#
+# Offline job that recomputes mood/intent analysis over users' stored history, e.g. after a change
+# to MoodAttributes/IntentAttributes or the mood score mapping. Run it from the project root:
+#
+#   python -m modules.reanalysis --user-ids <id> [<id> ...] --checkpoint reanalysis_checkpoint.json
+#   python -m modules.reanalysis --export memories.jsonl --output reanalysis_results.jsonl
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableParallel
+from pydantic import BaseModel
+
+from modules.llm_setup import mood_llm, intent_llm
+from modules.pydantic_models import MoodAttributes, IntentAttributes
+from modules.mem0_config import mem0_client, iter_user_memory_pages
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_CONCURRENCY = 8
+MEM0_OUTPUT = "mem0"
+
+# Identifies the analysis schema a result was produced with, so moods from older schemas can be told apart
+ANALYSIS_VERSION = hashlib.sha1(json.dumps(
+    [MoodAttributes.model_json_schema(), IntentAttributes.model_json_schema()], sort_keys=True
+).encode("utf-8")).hexdigest()[:12]
+
+# Mood and intent for the same message in one batch call, so a chunk takes as long as the slower of the two
+analysis_llm = RunnableParallel(mood=mood_llm, intent=intent_llm)
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    Loads the resume state written by save_checkpoint, or an empty state if there is none yet.
+    The state holds per-source progress under "sources" and records to retry under "failed".
+    """
+    if not os.path.exists(path):
+        return {"sources": {}, "failed": []}
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    checkpoint.setdefault("sources", {})
+    checkpoint.setdefault("failed", [])
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """
+    Writes the resume state atomically so an interruption never leaves a half-written file behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _is_user_message(memory: dict) -> bool:
+    # Skip earlier mood summaries so a re-run does not classify its own output
+    return "user_mood" not in (memory.get("categories") or []) and bool(memory.get("memory"))
+
+
+def iter_mem0_chunks(user_ids: List[str], checkpoint: dict, page_size: int) -> Iterator[Tuple[str, dict, List[dict]]]:
+    """
+    Streams each user's stored memories from Mem0 page by page.
+    Yields (user_id, checkpoint state after this chunk, records).
+
+    Each user is paged from a snapshot (memories created up to the time the user was first visited),
+    so mood memories written back during the run do not shift the pages of a resumed run.
+    """
+    sources = checkpoint["sources"]
+    for user_id in user_ids:
+        state = sources.get(user_id, {})
+        if state.get("done"):
+            continue
+        snapshot = state.get("snapshot") or datetime.now(timezone.utc).isoformat()
+        pages = iter_user_memory_pages(user_id, page_size=page_size, start_page=state.get("page", 1), until=snapshot)
+        for page, memories in pages:
+            records = [
+                {"user_id": user_id, "memory_id": m.get("id"), "text": m["memory"], "created_at": m.get("created_at")}
+                for m in memories if _is_user_message(m)
+            ]
+            yield user_id, {"page": page + 1, "snapshot": snapshot}, records
+        yield user_id, {"done": True, "snapshot": snapshot}, []
+
+
+def iter_export_chunks(export_path: str, checkpoint: dict, page_size: int) -> Iterator[Tuple[str, dict, List[dict]]]:
+    """
+    Streams a local JSONL export (one memory per line with user_id and memory/content) in chunks of page_size.
+    Yields (checkpoint key, checkpoint state after this chunk, records).
+    """
+    key = f"export:{os.path.abspath(export_path)}"
+    state = checkpoint["sources"].get(key, {})
+    if state.get("done"):
+        return
+    start_line = state.get("line", 0)
+    records = []
+    line_no = 0
+    with open(export_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= start_line or not line.strip():
+                continue
+            m = json.loads(line)
+            text = m.get("memory") or m.get("content")
+            if m.get("user_id") and _is_user_message({**m, "memory": text}):
+                records.append({"user_id": m["user_id"], "memory_id": m.get("id"), "text": text, "created_at": m.get("created_at")})
+            if len(records) >= page_size:
+                yield key, {"line": line_no}, records
+                records = []
+    yield key, {"line": line_no, "done": True}, records
+
+
+def _parsed_dict(raw) -> dict:
+    # Same shapes the chat loop accepts from with_structured_output(include_raw=True)
+    if isinstance(raw, dict) and isinstance(raw.get("parsed"), BaseModel):
+        return raw["parsed"].model_dump()
+    if isinstance(raw, BaseModel):
+        return raw.model_dump()
+    return {}
+
+
+def format_mood_summary(mood_data: dict) -> Optional[str]:
+    """
+    Formats mood data the same way the chat loop stores it under the 'user_mood' category.
+    """
+    if not mood_data:
+        return None
+    summary = f"Mood: {mood_data.get('mood', 'unknown')}, Intensity: {mood_data.get('intensity', 'unknown')}"
+    if mood_data.get("reason"):
+        summary += f", Reason: {mood_data['reason']}"
+    return summary
+
+
+def classify_records(records: List[dict], max_concurrency: int) -> Tuple[List[dict], List[dict]]:
+    """
+    Classifies mood and intent for a chunk of records with one bounded-concurrency batch call.
+    Returns (results, failed records); a record fails if either analysis raised or returned no parsed output.
+    """
+    texts = [r["text"] for r in records]
+    analyses = analysis_llm.batch(texts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+    analyzed_at = datetime.now(timezone.utc).isoformat()
+    results = []
+    failed = []
+    for record, analysis in zip(records, analyses):
+        if isinstance(analysis, Exception):
+            print(f"Error analyzing memory {record['memory_id']}: {type(analysis).__name__}: {analysis}")
+            failed.append(record)
+            continue
+        mood_data = _parsed_dict(analysis["mood"])
+        intent_data = _parsed_dict(analysis["intent"])
+        if not mood_data or not intent_data:
+            print(f"Error analyzing memory {record['memory_id']}: mood={'ok' if mood_data else 'no parsed output'}, "
+                  f"intent={'ok' if intent_data else 'no parsed output'}")
+            failed.append(record)
+            continue
+        results.append({**record, "mood": mood_data, "intent": intent_data,
+                        "analyzed_at": analyzed_at, "analysis_version": ANALYSIS_VERSION})
+    return results, failed
+
+
+def write_results_local(results: List[dict], output_path: str) -> None:
+    """
+    Appends analysis results to a local JSONL store.
+    """
+    with open(output_path, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def mood_metadata(result: dict) -> dict:
+    return {
+        "source": "reanalysis",
+        "memory_id": result["memory_id"],
+        "source_created_at": result["created_at"],
+        "analysis_version": result["analysis_version"],
+        "analyzed_at": result["analyzed_at"]
+    }
+
+
+def write_results_mem0(results: List[dict]) -> List[dict]:
+    """
+    Stores analysis results as fresh 'user_mood' memories, matching what the chat loop writes per turn.
+    The metadata records the analyzed message's created_at and the analysis version, since the new
+    memory's own created_at is the time of the run.
+    Returns the records that could not be stored, so they can be retried.
+    """
+    failed = []
+    for result in results:
+        mood_summary = format_mood_summary(result["mood"])
+        try:
+            mem0_client.add(messages=[{"role": "user", "content": f"User's mood detected: {mood_summary}"}],
+                            user_id=result["user_id"],
+                            categories=["user_mood"],
+                            metadata=mood_metadata(result))
+        except Exception as e:
+            print(f"Could not add re-analyzed mood to Mem0 for memory {result['memory_id']}: {e}")
+            failed.append({k: result[k] for k in ("user_id", "memory_id", "text", "created_at")})
+    return failed
+
+
+def run_reanalysis(user_ids: List[str], export_path: Optional[str], output: str, checkpoint_path: str,
+                   page_size: int = DEFAULT_PAGE_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Tuple[int, int]:
+    """
+    Re-runs mood/intent analysis over stored history and returns (messages re-analyzed, messages failed).
+
+    Results are written and the checkpoint is saved after every chunk. Records that failed on a previous
+    run are retried first; records that fail now are kept in the checkpoint for the next run.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    retry_records = checkpoint["failed"]
+    checkpoint["failed"] = []
+    if export_path:
+        chunks = iter_export_chunks(export_path, checkpoint, page_size)
+    else:
+        chunks = iter_mem0_chunks(user_ids, checkpoint, page_size)
+
+    started = time.monotonic()
+    processed = 0
+    new_failures = []
+
+    def process(records: List[dict]) -> None:
+        nonlocal processed
+        results, failed = classify_records(records, max_concurrency)
+        if output == MEM0_OUTPUT:
+            failed += write_results_mem0(results)
+        else:
+            write_results_local(results, output)
+        processed += len(records) - len(failed)
+        new_failures.extend(failed)
+
+    def report(key: str) -> None:
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"[{key}] {processed} messages re-analyzed, {len(new_failures)} failed, "
+              f"in {elapsed:.1f}s ({rate:.2f} msg/s)")
+
+    for i in range(0, len(retry_records), page_size):
+        process(retry_records[i:i + page_size])
+        checkpoint["failed"] = new_failures + retry_records[i + page_size:]
+        save_checkpoint(checkpoint_path, checkpoint)
+        report("retry")
+
+    for key, state, records in chunks:
+        if records:
+            process(records)
+        checkpoint["sources"][key] = state
+        checkpoint["failed"] = new_failures
+        save_checkpoint(checkpoint_path, checkpoint)
+        report(key)
+
+    return processed, len(new_failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run mood and intent analysis over stored user history.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--user-ids", nargs="+", help="Mem0 user_ids whose memories should be re-analyzed.")
+    source.add_argument("--export", help="Local JSONL export to read instead of Mem0.")
+    parser.add_argument("--output", default=MEM0_OUTPUT,
+                        help=f"'{MEM0_OUTPUT}' to store fresh user_mood memories, or a local JSONL path.")
+    parser.add_argument("--checkpoint", default="reanalysis_checkpoint.json", help="Resume state file.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    processed, failed = run_reanalysis(args.user_ids or [], args.export, args.output, args.checkpoint,
+                                       page_size=args.page_size, max_concurrency=args.max_concurrency)
+    elapsed = time.monotonic() - started
+    print(f"Done: {processed} messages in {elapsed:.1f}s ({processed / elapsed if elapsed > 0 else 0.0:.2f} msg/s), "
+          f"{failed} failed")
+    if failed:
+        print(f"Failed messages are kept in {args.checkpoint}; re-run the same command to retry them.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
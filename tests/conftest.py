@@ -0,0 +1,20 @@
+import os
+import sys
+import types
+from unittest.mock import MagicMock
+
+# Dummy Azure settings so modules.llm_setup can build its clients; no request is sent in the tests
+for name, value in {
+    "OPENAI_API_KEY": "test-key",
+    "OPENAI_API_ENDPOINT": "https://example.openai.azure.com/",
+    "OPENAI_MODEL_DEPLOYMENT_NAME": "main-deployment",
+    "OPENAI_MODEL": "gpt-4o",
+    "OPENAI_API_VERSION": "2024-10-21",
+}.items():
+    os.environ.setdefault(name, value)
+
+# modules.mem0_config connects to the Mem0 API at import time, so tests use an offline stand-in
+fake_mem0_config = types.ModuleType("modules.mem0_config")
+fake_mem0_config.mem0_client = MagicMock()
+fake_mem0_config.iter_user_memory_pages = MagicMock(return_value=iter(()))
+sys.modules["modules.mem0_config"] = fake_mem0_config
@@ -0,0 +1,162 @@
+import sys
+import threading
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+import pytest
+
+from modules import export
+from modules.mood_scoring import parse_mood_from_memory, mood_score
+
+
+def _memory(memory_id, created_at, text="likes hiking", categories=("user_interests",)):
+    return {"id": memory_id, "memory": text, "categories": list(categories), "created_at": created_at}
+
+
+@pytest.fixture
+def fake_pages(monkeypatch):
+    def install(memories_by_user, failing_users=()):
+        def iter_pages(user_id, page_size=100, start_page=1, since=None, until=None):
+            if user_id in failing_users:
+                raise RuntimeError(f"Mem0 unavailable for {user_id}")
+            memories = memories_by_user.get(user_id, [])
+            for page, i in enumerate(range(0, len(memories), page_size), start=1):
+                yield page, memories[i:i + page_size]
+        monkeypatch.setattr(export, "iter_user_memory_pages", iter_pages)
+    return install
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Mood: joyful, Intensity: medium, Reason: good news", "joyful"),
+    ("User's mood detected: Mood: sad, Intensity: high", "sad"),
+    ("The user seems anxious about exams", "anxious"),
+    ("Mood: unknown, Intensity: low", "neutral"),
+    ("Likes pizza", "neutral"),
+])
+def test_parse_mood_from_memory(text, expected):
+    assert parse_mood_from_memory(text) == expected
+
+
+def test_memory_to_row_parses_mood_only_for_mood_memories():
+    mood_row = export.memory_to_row("u1", _memory("m1", "2024-05-01T10:00:00Z", "Mood: angry, Intensity: high", ["user_mood"]))
+    assert mood_row["mood"] == "angry"
+    assert mood_row["mood_score"] == mood_score("angry")
+    assert mood_row["category"] == "user_mood"
+    assert mood_row["created_at"] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+
+    other_row = export.memory_to_row("u1", _memory("m2", None, "Mood: angry", ["user_interests", "user_preferences"]))
+    assert other_row["mood"] is None and other_row["mood_score"] is None
+    assert other_row["category"] == "user_interests,user_preferences"
+    assert other_row["created_at"] is None
+
+
+def test_in_export_window_treats_naive_timestamps_as_utc():
+    since = export._parse_timestamp("2024-01-01")
+    until = export._parse_timestamp("2024-02-01T00:00:00Z")
+    assert since.tzinfo is not None
+    assert export.in_export_window(_memory("m1", "2024-01-02T00:00:00Z"), since, until)
+    assert not export.in_export_window(_memory("m2", "2024-01-01T00:00:00+00:00"), since, until)
+    assert not export.in_export_window(_memory("m3", "2023-12-31T23:59:59Z"), since, until)
+    assert export.in_export_window(_memory("m4", "2024-02-01T00:00:00Z"), since, until)
+    assert not export.in_export_window(_memory("m5", "2024-02-01T00:00:01Z"), since, until)
+
+
+def test_export_streams_row_groups_and_respects_watermark(tmp_path, fake_pages):
+    fake_pages({
+        "u1": [_memory(f"a{i}", f"2024-01-0{i + 1}T00:00:00Z") for i in range(5)],
+        "u2": [_memory("b0", "2024-01-09T00:00:00Z", "Mood: joyful", ["user_mood"])],
+    })
+    output = tmp_path / "memories.parquet"
+
+    result = export.export_memories(["u1", "u2"], str(output), row_group_size=2, page_size=2,
+                                    since={"u1": "2024-01-02"})
+
+    assert result["failed_users"] == {}
+    assert result["rows"] == 4
+    parquet_file = pq.ParquetFile(output)
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert sorted(table.column("memory_id").to_pylist()) == ["a2", "a3", "a4", "b0"]
+
+
+def test_memory_added_during_export_is_picked_up_next_time(tmp_path, fake_pages, monkeypatch):
+    # u2 gets a memory at 10:05 while the 10:10 export runs; u1's last memory (10:09) is newer than it
+    memories = {
+        "u1": [_memory("a0", "2024-03-01T10:09:00Z")],
+        "u2": [_memory("b0", "2024-03-01T09:00:00Z"), _memory("b1", "2024-03-01T10:05:00Z")],
+    }
+    fake_pages(memories)
+    watermark = tmp_path / "watermark.json"
+
+    def run(now, output):
+        monkeypatch.setattr(export, "_now", lambda: export._parse_timestamp(now))
+        monkeypatch.setattr(sys, "argv", ["export", "--user-ids", "u1", "u2", "--output", str(output),
+                                          "--watermark", str(watermark)])
+        export.main()
+        return sorted(pq.read_table(output).column("memory_id").to_pylist())
+
+    # Snapshot taken at 10:04: b1 (10:05) and a0 (10:09) are not part of this export yet
+    assert run("2024-03-01T10:04:00Z", tmp_path / "first.parquet") == ["b0"]
+    assert run("2024-03-01T11:00:00Z", tmp_path / "second.parquet") == ["a0", "b1"]
+
+
+def test_watermarks_are_kept_per_user(tmp_path, fake_pages, monkeypatch):
+    fake_pages({"u1": [_memory("a0", "2024-03-01T10:00:00Z")], "u2": [_memory("b0", "2024-01-01T00:00:00Z")]})
+    watermark = tmp_path / "watermark.json"
+    monkeypatch.setattr(export, "_now", lambda: export._parse_timestamp("2024-03-02T00:00:00Z"))
+
+    for user_id in ("u1", "u2"):
+        output = tmp_path / f"{user_id}.parquet"
+        monkeypatch.setattr(sys, "argv", ["export", "--user-ids", user_id, "--output", str(output),
+                                          "--watermark", str(watermark)])
+        export.main()
+
+    # u2 was never exported before, so its old memory is included despite u1's newer watermark
+    assert pq.read_table(tmp_path / "u2.parquet").column("memory_id").to_pylist() == ["b0"]
+    assert set(export.load_watermarks(str(watermark))) == {"u1", "u2"}
+
+
+def test_export_reports_failed_users(tmp_path, fake_pages):
+    fake_pages({"u1": [_memory("a0", "2024-01-01T00:00:00Z")]}, failing_users={"u2"})
+
+    result = export.export_memories(["u1", "u2"], str(tmp_path / "memories.parquet"))
+
+    assert result["rows"] == 1
+    assert list(result["failed_users"]) == ["u2"]
+
+
+def test_export_does_not_hang_when_writer_fails(tmp_path, fake_pages, monkeypatch):
+    fake_pages({f"u{n}": [_memory(f"{n}-{i}", "2024-01-01T00:00:00Z") for i in range(50)] for n in range(4)})
+
+    def failing_write(self, rows):
+        raise OSError("disk full")
+    monkeypatch.setattr(export._ColumnarWriter, "write_rows", failing_write)
+
+    errors = []
+    def run():
+        try:
+            export.export_memories([f"u{n}" for n in range(4)], str(tmp_path / "memories.parquet"),
+                                   row_group_size=1, page_size=1, max_concurrency=2)
+        except OSError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+
+def test_memory_to_row_places_reanalyzed_moods_at_message_time():
+    memory = _memory("m1", "2024-06-01T12:00:00Z", "User's mood detected: Mood: sad, Intensity: low", ["user_mood"])
+    memory["metadata"] = {"source": "reanalysis", "source_created_at": "2024-01-05T08:30:00Z", "analysis_version": "abc123"}
+
+    row = export.memory_to_row("u1", memory)
+
+    assert row["created_at"] == datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+    assert row["mood_at"] == datetime(2024, 1, 5, 8, 30, tzinfo=timezone.utc)
+    assert row["analysis_version"] == "abc123"
+
+    chat_row = export.memory_to_row("u1", _memory("m2", "2024-01-05T08:30:00Z", "Mood: sad", ["user_mood"]))
+    assert chat_row["mood_at"] == chat_row["created_at"]
+    assert chat_row["analysis_version"] is None
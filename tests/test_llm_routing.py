@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.runnables import RunnableWithFallbacks
+
+from modules import llm_routing
+
+
+@pytest.fixture(autouse=True)
+def clear_route_env(monkeypatch):
+    for task in llm_routing.ROUTE_DEFAULTS:
+        for suffix in ("DEPLOYMENT", "TEMPERATURE", "MAX_TOKENS", "INPUT_COST_PER_1K", "OUTPUT_COST_PER_1K"):
+            monkeypatch.delenv(f"LLM_ROUTE_{task.upper()}_{suffix}", raising=False)
+    for prefix in ("OPENAI_MODEL", "OPENAI_SMALL_MODEL"):
+        monkeypatch.delenv(f"{prefix}_INPUT_COST_PER_1K", raising=False)
+        monkeypatch.delenv(f"{prefix}_OUTPUT_COST_PER_1K", raising=False)
+    monkeypatch.setattr(llm_routing, "OPENAI_MODEL_DEPLOYMENT_NAME", "main-deployment")
+    monkeypatch.setattr(llm_routing, "OPENAI_SMALL_MODEL_DEPLOYMENT_NAME", "small-deployment")
+
+
+def test_load_route_config_uses_defaults_per_tier(monkeypatch):
+    monkeypatch.setenv("OPENAI_SMALL_MODEL_INPUT_COST_PER_1K", "0.15")
+
+    reply = llm_routing.load_route_config("reply")
+    mood = llm_routing.load_route_config("mood")
+
+    assert (reply.deployment, reply.temperature, reply.max_tokens) == ("main-deployment", 0.7, None)
+    assert (mood.deployment, mood.temperature, mood.max_tokens) == ("small-deployment", 0.0, 200)
+    assert mood.input_cost_per_1k == 0.15
+    assert reply.input_cost_per_1k == 0.0
+
+
+def test_load_route_config_env_overrides(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTE_MOOD_DEPLOYMENT", "mood-deployment")
+    monkeypatch.setenv("LLM_ROUTE_MOOD_TEMPERATURE", "0.2")
+    monkeypatch.setenv("LLM_ROUTE_MOOD_MAX_TOKENS", "150")
+    monkeypatch.setenv("LLM_ROUTE_MOOD_OUTPUT_COST_PER_1K", "0.6")
+
+    mood = llm_routing.load_route_config("mood")
+
+    assert mood.deployment == "mood-deployment"
+    assert mood.temperature == 0.2
+    assert mood.max_tokens == 150
+    assert mood.output_cost_per_1k == 0.6
+
+
+def test_small_routes_fall_back_to_main_without_retrying_first():
+    routed = llm_routing.get_routed_llm("topic")
+
+    assert isinstance(routed, RunnableWithFallbacks)
+    assert routed.runnable.deployment_name == "small-deployment"
+    assert routed.runnable.max_retries == llm_routing.PRIMARY_RETRIES_WITH_FALLBACK
+    assert routed.fallbacks[0].deployment_name == "main-deployment"
+    assert routed.runnable.stream_usage
+
+
+def test_main_routes_have_no_fallback():
+    routed = llm_routing.get_routed_llm("reply")
+
+    assert not isinstance(routed, RunnableWithFallbacks)
+    assert routed.max_retries == 2
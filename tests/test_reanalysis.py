@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from modules import reanalysis
+from modules.pydantic_models import MoodAttributes, IntentAttributes
+
+
+class FakeAnalysisLLM:
+    """Mimics RunnableParallel(mood=..., intent=...).batch, failing for texts listed in `fail_on`."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    def batch(self, texts, config=None, return_exceptions=False):
+        self.calls.append(list(texts))
+        return [
+            RuntimeError("boom") if t in self.fail_on else {
+                "mood": {"raw": None, "parsed": MoodAttributes(mood="joyful", intensity="high"), "parsing_error": None},
+                "intent": {"raw": None, "parsed": IntentAttributes(intent="statement"), "parsing_error": None},
+            }
+            for t in texts
+        ]
+
+
+@pytest.fixture
+def export_file(tmp_path):
+    path = tmp_path / "memories.jsonl"
+    rows = [{"user_id": "u1", "id": f"m{i}", "memory": f"message {i}", "created_at": f"2024-01-0{i + 1}T00:00:00Z"}
+            for i in range(5)]
+    rows.insert(2, {"user_id": "u1", "id": "mood", "memory": "Mood: sad", "categories": ["user_mood"]})
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def fake_llms(monkeypatch):
+    def install(fail_on=()):
+        analysis = FakeAnalysisLLM(fail_on)
+        monkeypatch.setattr(reanalysis, "analysis_llm", analysis)
+        return analysis
+    return install
+
+
+def test_iter_export_chunks_skips_mood_memories_and_resumes(export_file):
+    checkpoint = {"sources": {}, "failed": []}
+    chunks = list(reanalysis.iter_export_chunks(str(export_file), checkpoint, page_size=2))
+    assert [[r["memory_id"] for r in records] for _, _, records in chunks] == [["m0", "m1"], ["m2", "m3"], ["m4"]]
+    assert chunks[0][1] == {"line": 2}
+    assert chunks[-1][1]["done"]
+
+    key = chunks[0][0]
+    checkpoint["sources"][key] = chunks[0][1]
+    resumed = list(reanalysis.iter_export_chunks(str(export_file), checkpoint, page_size=2))
+    assert [r["memory_id"] for _, _, records in resumed for r in records] == ["m2", "m3", "m4"]
+
+    checkpoint["sources"][key] = chunks[-1][1]
+    assert list(reanalysis.iter_export_chunks(str(export_file), checkpoint, page_size=2)) == []
+
+
+def test_run_reanalysis_checkpoints_each_chunk(tmp_path, export_file, fake_llms, monkeypatch):
+    fake_llms()
+    checkpoint_path = tmp_path / "checkpoint.json"
+    saved = []
+    original_save = reanalysis.save_checkpoint
+    monkeypatch.setattr(reanalysis, "save_checkpoint",
+                        lambda path, cp: (saved.append(json.loads(json.dumps(cp))), original_save(path, cp)))
+    monkeypatch.setattr(reanalysis, "write_results_mem0", lambda results: [])
+
+    processed, failed = reanalysis.run_reanalysis([], str(export_file), reanalysis.MEM0_OUTPUT, str(checkpoint_path), page_size=2)
+
+    assert (processed, failed) == (5, 0)
+    # One checkpoint per chunk, even when writing back to Mem0
+    assert len(saved) == 3
+    assert list(saved[0]["sources"].values()) == [{"line": 2}]
+
+
+def test_failed_records_are_kept_and_retried(tmp_path, export_file, fake_llms):
+    fake_llms(fail_on={"message 1"})
+    checkpoint_path = tmp_path / "checkpoint.json"
+    output_path = tmp_path / "results.jsonl"
+
+    processed, failed = reanalysis.run_reanalysis([], str(export_file), str(output_path), str(checkpoint_path), page_size=2)
+
+    assert (processed, failed) == (4, 1)
+    rows = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert [r["memory_id"] for r in rows] == ["m0", "m2", "m3", "m4"]
+    assert all(r["mood"] and r["intent"] for r in rows)
+    assert [r["memory_id"] for r in reanalysis.load_checkpoint(str(checkpoint_path))["failed"]] == ["m1"]
+
+    analysis = fake_llms()
+    processed, failed = reanalysis.run_reanalysis([], str(export_file), str(output_path), str(checkpoint_path), page_size=2)
+
+    assert (processed, failed) == (1, 0)
+    assert analysis.calls == [["message 1"]]
+    assert reanalysis.load_checkpoint(str(checkpoint_path))["failed"] == []
+
+
+def test_mem0_results_keep_message_time_and_analysis_version(export_file, fake_llms, tmp_path):
+    fake_llms()
+    client = reanalysis.mem0_client
+    client.reset_mock()
+
+    reanalysis.run_reanalysis([], str(export_file), reanalysis.MEM0_OUTPUT, str(tmp_path / "checkpoint.json"), page_size=10)
+
+    metadata = client.add.call_args_list[0].kwargs["metadata"]
+    assert metadata["source"] == "reanalysis"
+    assert metadata["memory_id"] == "m0"
+    assert metadata["source_created_at"] == "2024-01-01T00:00:00Z"
+    assert metadata["analysis_version"] == reanalysis.ANALYSIS_VERSION
+    assert metadata["analyzed_at"]